@@ -1,10 +1,86 @@
 from api import db
-from api.models import User, Task
+from api.models import User, Task, STATUS, task_dependency
 from flask import current_app, request, abort
 import sqlalchemy as sa
+import sqlalchemy.orm as so
 import functools
 
-ATTRIBUTES = ["id", "project", "name", "description", "status", "username"]
+ATTRIBUTES = ["id", "project", "name", "description", "status", "username", "parent_id"]
+MAX_TREE_DEPTH = 20
+
+# prebuilt statements, values are supplied as bound parameters at execution time
+USER_BY_USERNAME = sa.select(User).where(User.username == sa.bindparam('username'))
+
+
+def _build_subtree_cte() -> sa.CTE:
+    '''Builds recursive CTE walking down the parent references - all subtasks of task_id up to the given depth'''
+
+    cte = (sa.select(Task.id, sa.literal(0, sa.Integer).label('depth'))
+           .where(Task.id == sa.bindparam('task_id'))
+           .cte('subtree', recursive=True))
+    child = so.aliased(Task)
+
+    return cte.union_all(
+        sa.select(child.id, cte.c.depth + 1)
+        .join(cte, child.parent_id == cte.c.id)
+        .where(cte.c.depth < sa.bindparam('depth')))
+
+
+def _build_blockers_cte() -> sa.CTE:
+    '''Builds recursive CTE walking the dependency table - all transitive blockers of task_id up to the given depth'''
+
+    cte = (sa.select(task_dependency.c.blocker_id.label('id'), sa.literal(1, sa.Integer).label('depth'))
+           .where(task_dependency.c.task_id == sa.bindparam('task_id'))
+           .cte('blockers', recursive=True))
+    dependency = task_dependency.alias()
+
+    return cte.union_all(
+        sa.select(dependency.c.blocker_id, cte.c.depth + 1)
+        .join(cte, dependency.c.task_id == cte.c.id)
+        .where(cte.c.depth < sa.bindparam('depth')))
+
+
+def _build_cycle_check_ctes() -> tuple[sa.CTE, sa.CTE]:
+    '''Builds recursive CTEs with ids of task_id and all its subtasks, and of all transitive blockers of task_id.
+    No depth limit - UNION drops already visited ids, so the recursion ends even if the graph has a cycle'''
+
+    subtasks = sa.select(Task.id).where(Task.id == sa.bindparam('task_id')).cte('all_subtasks', recursive=True)
+    child = so.aliased(Task)
+    subtasks = subtasks.union(sa.select(child.id).join(subtasks, child.parent_id == subtasks.c.id))
+
+    blockers = (sa.select(task_dependency.c.blocker_id.label('id'))
+                .where(task_dependency.c.task_id == sa.bindparam('task_id'))
+                .cte('all_blockers', recursive=True))
+    dependency = task_dependency.alias()
+    blockers = blockers.union(
+        sa.select(dependency.c.blocker_id).join(blockers, dependency.c.task_id == blockers.c.id))
+
+    return subtasks, blockers
+
+
+_subtree = _build_subtree_cte()
+_blockers = _build_blockers_cte()
+_all_subtasks, _all_blockers = _build_cycle_check_ctes()
+
+ALL_SUBTASK_IDS = sa.select(_all_subtasks.c.id)
+ALL_BLOCKER_IDS = sa.select(_all_blockers.c.id)
+
+# regular users get only their own tasks, queries keyed by "is admin"
+OWN_TASKS = Task.username == sa.bindparam('username')
+
+SUBTREE_QUERY = sa.select(Task, _subtree.c.depth).join(_subtree, Task.id == _subtree.c.id) \
+    .where(_subtree.c.depth > 0).order_by(_subtree.c.depth, Task.id)
+SUBTREE_QUERIES = {True: SUBTREE_QUERY, False: SUBTREE_QUERY.where(OWN_TASKS)}
+
+SUBTREE_STATUS_QUERY = sa.select(Task.status, sa.func.count()).join(_subtree, Task.id == _subtree.c.id) \
+    .group_by(Task.status)
+SUBTREE_STATUS_QUERIES = {True: SUBTREE_STATUS_QUERY, False: SUBTREE_STATUS_QUERY.where(OWN_TASKS)}
+
+# a blocker can be reached through several paths - keep the shortest one
+_blocker_depth = sa.func.min(_blockers.c.depth).label('depth')
+BLOCKERS_QUERY = sa.select(Task, _blocker_depth).join(_blockers, Task.id == _blockers.c.id) \
+    .group_by(Task.id).order_by(_blocker_depth, Task.id)
+BLOCKERS_QUERIES = {True: BLOCKERS_QUERY, False: BLOCKERS_QUERY.where(OWN_TASKS)}
 
 
 def filter_request_parameters(func):
@@ -67,12 +143,60 @@ def check_task_id(task_id: str) -> Task:
     return task
 
 
+def check_parent_id(parent_id: str, task: Task = None) -> Task:
+    '''Helper function to check if parent task is stored in the DB and, when editing, that it is not a subtask of the task'''
+
+    if parent_id:
+        parent = get_task(parent_id)
+        if not parent:
+            message = "Invalid parent id."
+            abort(404, description=message)
+
+        # the parent can't be the task itself or any of its subtasks
+        if task and parent.id in db.session.scalars(ALL_SUBTASK_IDS, {'task_id': task.id}):
+            message = "Invalid parent id. Task cannot be a subtask of itself."
+            abort(400, description=message)
+        return parent
+
+
+def check_depth(depth: str) -> int:
+    '''Helper function to check the depth limit of a tree query, defaults to MAX_TREE_DEPTH'''
+
+    if not depth:
+        return MAX_TREE_DEPTH
+    try:
+        depth = int(depth)
+    except ValueError:
+        depth = 0
+    if not 1 <= depth <= MAX_TREE_DEPTH:
+        message = f"Invalid depth. Allowed values 1 - {MAX_TREE_DEPTH}."
+        abort(400, description=message)
+    return depth
+
+
+def check_task_owner(task: Task, token_user: User):
+    '''Helper function to check if the token user is assigned to the task, only admins can access other user's tasks'''
+
+    if task.username != token_user.username and token_user.role != 'admin':
+        current_app.logger.error(f"Authorization error. User: {token_user}")
+        message = "You don't have the permission to access the requested resource."
+        abort(403, description=message)
+
+
 def get_user(username: str) -> User:
     '''Helper function to get user object from the DB'''
 
-    query = sa.select(User).where(User.username == username)
+    return db.session.scalar(USER_BY_USERNAME, {'username': username})
+
+
+@functools.lru_cache(maxsize=2 ** len(ATTRIBUTES))
+def get_task_filter_query(keys: tuple[str, ...]) -> sa.Select:
+    '''Helper function to get the task query for a given filter shape (tuple of attribute names).
+    There are at most 2 ** len(ATTRIBUTES) shapes, so each one is constructed only once and reused with bound parameters'''
 
-    return db.session.scalar(query)
+    condition = [getattr(Task, key) == sa.bindparam(key) for key in keys]
+
+    return sa.select(Task).where(*condition)
 
 
 def get_task(task_id: int) -> Task:
@@ -109,21 +233,112 @@ def get_task_list(request_data: dict, token_user: User) -> list[dict]:
         request_data = dict(request_data)
         request_data['username'] = token_user.username
     
-    condition = [getattr(Task, key, None) == request_data[key] for key in ATTRIBUTES if request_data[key]]
+    params = {key : request_data[key] for key in ATTRIBUTES if request_data[key]}
     
     # if no parameters specified - no communication with the DB, return an empty list
-    if not condition:
+    if not params:
         return [], 200
     
-    # construct query based on the condition
-    query = sa.select(Task).where(*condition)
-    task_objects = db.session.scalars(query).all()
+    # get prebuilt query for the filter shape and pass the values as bound parameters
+    query = get_task_filter_query(tuple(params))
+    task_objects = db.session.scalars(query, params).all()
     
     tasks = [task.obj_to_dict() for task in task_objects]
     
     return tasks, 200
 
 
+def get_task_subtree(task_id: int, depth: str, token_user: User) -> dict:
+    '''Gets all subtasks of the task up to the given depth together with the subtree status rollup'''
+
+    task = check_task_id(task_id)
+    check_task_owner(task, token_user)
+
+    is_admin = token_user.role == 'admin'
+    params = {'task_id': task.id, 'depth': check_depth(depth), 'username': token_user.username}
+
+    rows = db.session.execute(SUBTREE_QUERIES[is_admin], params).all()
+    status_counts = dict.fromkeys(STATUS.__args__, 0)
+    status_counts.update(db.session.execute(SUBTREE_STATUS_QUERIES[is_admin], params).all())
+
+    response = {
+        'task': task.obj_to_dict(),
+        'items': [dict(item.obj_to_dict(), depth=item_depth) for item, item_depth in rows],
+        'status_counts': status_counts
+        }
+
+    return response, 200
+
+
+def get_task_blockers(task_id: int, depth: str, token_user: User) -> dict:
+    '''Gets all tasks blocking the task, directly or transitively, up to the given depth'''
+
+    task = check_task_id(task_id)
+    check_task_owner(task, token_user)
+
+    is_admin = token_user.role == 'admin'
+    params = {'task_id': task.id, 'depth': check_depth(depth), 'username': token_user.username}
+
+    rows = db.session.execute(BLOCKERS_QUERIES[is_admin], params).all()
+
+    response = {
+        'task': task.obj_to_dict(),
+        'items': [dict(item.obj_to_dict(), depth=item_depth) for item, item_depth in rows]
+        }
+
+    return response, 200
+
+
+def add_task_blocker(task_id: int, request_data: dict, token_user: User) -> dict:
+    '''Marks the task as blocked by the task provided in request data'''
+
+    task = check_task_id(task_id)
+    blocker = check_task_id(request_data["id"])
+
+    # the task can't (transitively) block itself
+    if task.id == blocker.id or \
+        task.id in db.session.scalars(ALL_BLOCKER_IDS, {'task_id': blocker.id}):
+        message = "Invalid task id. Dependency cycle."
+        abort(400, description=message)
+
+    # dependency already exists - nothing to change
+    if db.session.scalar(task.blockers.select().where(Task.id == blocker.id)):
+        return {}, 200
+
+    try:
+        task.blockers.add(blocker)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"DB commit failed: {e}. User {token_user}")
+        abort(500, description=str(e))
+
+    return {'task': task.obj_to_dict(), 'blocker': blocker.obj_to_dict()}, 201
+
+
+def remove_task_blocker(task_id: int, request_data: dict, token_user: User) -> dict:
+    '''Removes the dependency between the task and the task provided in request data'''
+
+    task = check_task_id(task_id)
+    blocker = check_task_id(request_data["id"])
+
+    if not db.session.scalar(task.blockers.select().where(Task.id == blocker.id)):
+        message = "Task is not blocked by the provided task."
+        abort(404, description=message)
+
+    try:
+        task.blockers.remove(blocker)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"DB commit failed: {e}. User {token_user}")
+        abort(500, description=str(e))
+
+    return {}, 204
+
+
 def create_new_task(request_data: dict, token_user: User) -> dict:
     '''Creates new task based on provided input'''
 
@@ -135,12 +350,18 @@ def create_new_task(request_data: dict, token_user: User) -> dict:
             # username is the only parameter that can be empty - task can be unassigned
             if key == 'username':
                 check_username(request_data[key])
+
+            # parent_id is optional - task can be a top level task
+            elif key == 'parent_id':
+                continue
             
             # all other parameters have to be provided
             else:
                 message = "Invalid input. Required fields - project, task name, description, status."
                 abort(400, description=message)
 
+    check_parent_id(request_data['parent_id'])
+
     task = Task()
     for key, value in request_data.items():
         if value:
@@ -166,10 +387,7 @@ def edit_task(request_data: dict, token_user: User) -> dict:
     task = check_task_id(request_data["id"])
 
     # compare username in task with current_user (only admins can change other user's tasks)
-    if task.username != token_user.username and token_user.role != 'admin':
-        current_app.logger.error(f"Authorization error. User: {token_user}")
-        message = "You don't have the permission to access the requested resource."
-        abort(403, description=message)
+    check_task_owner(task, token_user)
         
     # remove 'id' key from request_data for further processing of the data
     request_data.pop('id')
@@ -182,7 +400,14 @@ def edit_task(request_data: dict, token_user: User) -> dict:
             # if all values are None - nothing to change
             return {}, 200
         else:    
-        # set attributes according to request
+            # explicit parent_id 0 detaches the task from its parent - it becomes a top level task
+            parent_id = request_data.pop('parent_id')
+            if parent_id in (0, '0'):
+                task.parent_id = None
+            elif parent := check_parent_id(parent_id, task):
+                task.parent_id = parent.id
+
+            # set attributes according to request
             for key, value in request_data.items():
                 if value:
                     setattr(task, key, value)
@@ -211,8 +436,11 @@ def delete_task(request_data: dict, token_user: User) -> dict:
     # check if task id is provided in query parameters and if it is a valid one
     task = check_task_id(request_data["id"])
 
-    # proceed with deleting the task from DB
+    # proceed with deleting the task from DB, subtasks become top level tasks and its dependencies are removed
     try:
+        db.session.execute(sa.update(Task).where(Task.parent_id == task.id).values(parent_id=None))
+        db.session.execute(sa.delete(task_dependency).where(
+            sa.or_(task_dependency.c.task_id == task.id, task_dependency.c.blocker_id == task.id)))
         db.session.delete(task)
         db.session.commit()
 
@@ -71,7 +71,7 @@ class User(db.Model, PaginatedAPIMixin):
 
     @staticmethod
     def check_token(token):
-        user = db.session.scalar(sa.select(User).where(User.token == token))
+        user = db.session.scalar(USER_BY_TOKEN, {'token': token})
         if not user or user.token_expiration.replace(
             tzinfo=timezone.utc) < datetime.now(timezone.utc):
             return None
@@ -79,6 +79,18 @@ class User(db.Model, PaginatedAPIMixin):
         return user
 
 
+# prebuilt statement used by User.check_token on every authenticated request
+USER_BY_TOKEN = sa.select(User).where(User.token == sa.bindparam('token'))
+
+
+# association table - task_id is blocked by blocker_id
+task_dependency = sa.Table(
+    'task_dependency',
+    db.metadata,
+    sa.Column('task_id', sa.Integer, sa.ForeignKey('task.id'), primary_key=True),
+    sa.Column('blocker_id', sa.Integer, sa.ForeignKey('task.id'), primary_key=True)
+)
+
 
 class Task(db.Model):
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
@@ -87,8 +99,19 @@ class Task(db.Model):
     description: so.Mapped[str] = so.mapped_column(sa.String(140))
     status: so.Mapped[STATUS] = so.mapped_column(sa.Enum('new', 'in_progress', 'on_hold', 'finished', 'canceled', name='status_enum'), default='new', server_default='new')
     username: so.Mapped[Optional[str]] = so.mapped_column(sa.ForeignKey(User.username), index=True)
+    parent_id: so.Mapped[Optional[int]] = so.mapped_column(sa.ForeignKey('task.id'), index=True)
 
     assignee : so.Mapped[User] = so.relationship(back_populates='tasks')
+    parent: so.Mapped[Optional['Task']] = so.relationship(back_populates='subtasks', remote_side=[id])
+    subtasks: so.WriteOnlyMapped['Task'] = so.relationship(back_populates='parent', passive_deletes=True)
+    blockers: so.WriteOnlyMapped['Task'] = so.relationship(
+        secondary=task_dependency, primaryjoin=(task_dependency.c.task_id == id),
+        secondaryjoin=(task_dependency.c.blocker_id == id),
+        back_populates='blocking', passive_deletes=True)
+    blocking: so.WriteOnlyMapped['Task'] = so.relationship(
+        secondary=task_dependency, primaryjoin=(task_dependency.c.blocker_id == id),
+        secondaryjoin=(task_dependency.c.task_id == id),
+        back_populates='blockers', passive_deletes=True)
 
     def __repr__(self):
         return "<Task object. Project: {}, name: {}, status: {}, username: {}>".format(self.project, self.name, self.status, self.username)
@@ -99,5 +122,6 @@ class Task(db.Model):
             'project': self.project, 
             'description': self.description, 
             'status':self.status,
-            'username': self.username
+            'username': self.username,
+            'parent_id': self.parent_id
             }
\ No newline at end of file
@@ -1,5 +1,7 @@
 from api import api
 from api.logic import get_task_list_all, get_task_list, delete_task, create_new_task, edit_task, filter_request_parameters, check_admin
+from api.logic import get_task_subtree, get_task_blockers, add_task_blocker, remove_task_blocker
+from flask import request
 from api.auth import token_auth
 
 @api.route("/api/tasks", methods = ["GET"])
@@ -66,4 +68,56 @@ def delete(token_user, filtered_data):
     
     response, status = delete_task(request_data, token_user)
     
+    return response, status
+
+
+@api.route("/api/task/<int:task_id>/subtree", methods = ["GET"])
+@token_auth.login_required
+def subtree(task_id):
+    '''Returns all subtasks of specified task (optional depth limit) with status counts of the whole subtree'''
+
+    token_user = token_auth.current_user()
+
+    response, status = get_task_subtree(task_id, request.args.get('depth'), token_user)
+
+    return response, status
+
+
+@api.route("/api/task/<int:task_id>/blockers", methods = ["GET"])
+@token_auth.login_required
+def blockers(task_id):
+    '''Returns all tasks blocking specified task, directly or transitively (optional depth limit)'''
+
+    token_user = token_auth.current_user()
+
+    response, status = get_task_blockers(task_id, request.args.get('depth'), token_user)
+
+    return response, status
+
+
+@api.route("/api/task/<int:task_id>/blockers", methods = ["POST"])
+@token_auth.login_required
+@check_admin(lambda: token_auth.current_user())
+@filter_request_parameters
+def new_blocker(token_user, filtered_data, task_id):
+    '''Marks specified task as blocked by the task with provided id (admin only)'''
+
+    request_data = filtered_data
+
+    response, status = add_task_blocker(task_id, request_data, token_user)
+
+    return response, status
+
+
+@api.route("/api/task/<int:task_id>/blockers", methods = ["DELETE"])
+@token_auth.login_required
+@check_admin(lambda: token_auth.current_user())
+@filter_request_parameters
+def delete_blocker(token_user, filtered_data, task_id):
+    '''Removes dependency between specified task and the task with provided id (admin only)'''
+
+    request_data = filtered_data
+
+    response, status = remove_task_blocker(task_id, request_data, token_user)
+
     return response, status
\ No newline at end of file
@@ -0,0 +1,70 @@
+'''
+Micro-benchmark of the per-request Python overhead of the task filter query and the token lookup.
+
+"before" builds the statements from scratch on every call, the way get_task_list and User.check_token used to,
+"after" calls get_task_list and User.check_token, which reuse prebuilt statements with bound parameters.
+Runs against an in-memory SQLite database:
+
+    python bench_queries.py
+'''
+
+import os
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+import timeit
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from api import api, db
+from api.models import User, Task
+from api.logic import ATTRIBUTES, get_task_list
+
+TOKEN = 'a' * 32
+NUMBER = 5000
+REPEAT = 5
+
+
+def setup_db() -> User:
+    '''Creates the tables and stores an admin user with 20 tasks'''
+
+    db.create_all()
+    user = User(username='admin', email='admin@example.com', role='admin', token=TOKEN,
+                token_expiration=datetime.now(timezone.utc) + timedelta(hours=1))
+    db.session.add(user)
+    for i in range(20):
+        db.session.add(Task(project=f'project{i % 3}', name=f'task{i}', description='description', status='new', username='admin'))
+    db.session.commit()
+
+    return user
+
+
+def before(request_data: dict, user: User):
+    '''Statements constructed on every call'''
+
+    condition = [getattr(Task, key, None) == request_data[key] for key in ATTRIBUTES if request_data[key]]
+    task_objects = db.session.scalars(sa.select(Task).where(*condition)).all()
+    [task.obj_to_dict() for task in task_objects]
+    db.session.scalar(sa.select(User).where(User.token == TOKEN))
+
+
+def after(request_data: dict, user: User):
+    '''Prebuilt statements with bound parameters'''
+
+    get_task_list(request_data, user)
+    User.check_token(TOKEN)
+
+
+def main():
+    with api.app_context():
+        user = setup_db()
+
+        # two-key filter: project and status
+        request_data = dict.fromkeys(ATTRIBUTES)
+        request_data.update(project='project1', status='new')
+
+        for func in (before, after):
+            best = min(timeit.repeat(lambda: func(request_data, user), number=NUMBER, repeat=REPEAT))
+            print(f"{func.__name__:>6}: {best / NUMBER * 1e6:.1f} us per call")
+
+
+if __name__ == '__main__':
+    main()